@@ -6,14 +6,22 @@ a formal SysMLv2 hardware model from natural language.
 """
 
 import os
+import re
 import json
 import textwrap
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
+from typing import Optional
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
 import anthropic
+import httpx
 
-from sysmlv2_validator import validate_sysmlv2
+from sysmlv2_validator import _open_literal_offset, _strip_comments_and_strings, validate_sysmlv2
 
 app = Flask(__name__)
 
@@ -21,17 +29,143 @@ app = Flask(__name__)
 # State
 # ---------------------------------------------------------------------------
 
-model_state = {
-    "sysml_source": "",
-    "history": [],
-    "conversation": [],  # Full agent conversation for context
-}
-
-
-def reset_model():
-    model_state["sysml_source"] = ""
-    model_state["history"] = []
-    model_state["conversation"] = []
+# Seconds an idle pooled connection stays open. The SDK default of 5s
+# drops the connection between turns, so nearly every turn would pay for
+# a fresh TCP + TLS handshake.
+KEEPALIVE_EXPIRY = 300.0
+
+# One shared client, so the HTTP connection pool (and its TLS sessions) is
+# reused across turns instead of being rebuilt for every request
+anthropic_client = anthropic.Anthropic(
+    max_retries=2,
+    timeout=anthropic.Timeout(60.0, connect=5.0),
+    http_client=anthropic.DefaultHttpxClient(
+        # The SDK's default pool sizes, with the longer keepalive
+        limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=KEEPALIVE_EXPIRY),
+    ),
+)
+
+
+def warm_up_client():
+    """Open a connection to the API so the first real turn skips the handshake.
+
+    Listing models is not billed, and with KEEPALIVE_EXPIRY the connection
+    it opens is still pooled when a user sends their first turn.
+    """
+    try:
+        anthropic_client.models.list(limit=1)
+    except anthropic.APIError:
+        pass
+
+
+def start_warm_up():
+    if os.environ.get("ANTHROPIC_API_KEY"):
+        threading.Thread(target=warm_up_client, name="warm-up", daemon=True).start()
+
+
+# Background validation of streamed SysML, so results are ready when the
+# stream closes
+validation_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="validate")
+
+# Minimum seconds between partial validations of one streaming response
+DIAGNOSTIC_INTERVAL = 0.2
+
+# Deferred analysis calls for fast-mode turns
+analysis_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="analyze")
+
+# Conversation summaries, kept off the request path
+compaction_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="compact")
+
+# How long /api/analysis holds a request open waiting for a result
+ANALYSIS_POLL_TIMEOUT = 25
+# Deferred analyses kept per session
+MAX_PENDING_ANALYSES = 5
+
+SESSION_COOKIE = "eos_sid"
+# Sessions idle for longer than this are dropped
+SESSION_TTL = 6 * 60 * 60
+# Upper bound on live sessions; the least recently seen are dropped first
+MAX_SESSIONS = 1000
+
+# Conversation messages kept per session before older turns are summarized
+MAX_CONVERSATION_MESSAGES = 10
+# Most recent messages kept verbatim when the conversation is summarized
+KEEP_RECENT_MESSAGES = 4
+
+# Session id -> state, ordered from least to most recently seen
+sessions: OrderedDict[str, dict] = OrderedDict()
+sessions_lock = threading.Lock()
+
+
+def new_session() -> dict:
+    return {
+        "sysml_source": "",
+        "history": [],
+        "conversation": [],  # Recent agent conversation for context
+        "batches": {},  # Pending batch id -> submission snapshot
+        "analyses": {},  # Fast-mode turn number -> future for its analysis
+        "deferred": [],  # (future, assistant message, history entry) to write back
+        "generation": 0,  # Bumped whenever a turn commits or the model resets
+        "turn_active": False,  # True while /api/add is streaming a turn
+        "compacting": False,  # True while older turns are being summarized
+        "lock": threading.Lock(),
+        "last_seen": time.monotonic(),
+    }
+
+
+def expire_sessions(now: float):
+    """Drop idle sessions and the least recently seen beyond the cap.
+
+    Must be called with ``sessions_lock`` held. A turn still streaming for
+    a dropped session keeps its own reference and finishes normally.
+    """
+    while sessions:
+        sid, session = next(iter(sessions.items()))
+        if len(sessions) <= MAX_SESSIONS and now - session["last_seen"] < SESSION_TTL:
+            break
+        del sessions[sid]
+
+
+def current_session(create: bool = True) -> Optional[dict]:
+    """Return the state for the requesting browser.
+
+    A session is created if needed unless ``create`` is False, in which
+    case requests without a live session get None.
+    """
+    sid = request.cookies.get(SESSION_COOKIE)
+    now = time.monotonic()
+    with sessions_lock:
+        session = sessions.get(sid) if sid else None
+        if session is not None and now - session["last_seen"] >= SESSION_TTL:
+            session = None
+        if session is None:
+            if not create:
+                expire_sessions(now)
+                return None
+            sid = g.new_sid = uuid.uuid4().hex
+            session = sessions[sid] = new_session()
+        session["last_seen"] = now
+        sessions.move_to_end(sid)
+        expire_sessions(now)
+    return session
+
+
+def reset_model(session: dict):
+    session["sysml_source"] = ""
+    session["history"] = []
+    session["conversation"] = []
+    session["batches"] = {}
+    session["analyses"] = {}
+    session["deferred"] = []
+    session["generation"] += 1
+
+
+@app.after_request
+def set_session_cookie(response):
+    sid = g.pop("new_sid", None)
+    if sid:
+        response.set_cookie(SESSION_COOKIE, sid, httponly=True, samesite="Lax")
+    return response
 
 
 # ---------------------------------------------------------------------------
@@ -113,114 +247,508 @@ Be concise but thorough. You are a senior systems engineer, not a chatbot.
 """)
 
 
-def call_agent(nl_input: str, current_model: str, conversation_history: list) -> dict:
-    """Call Claude as an agentic systems engineer."""
-    client = anthropic.Anthropic()
+# Trimmed prompt for small, mechanical edits: same output contract, no
+# guidance or best-practices sections.
+SYSTEM_PROMPT_LITE = textwrap.dedent("""\
+You are EngineeringOS, a systems engineer AI editing a SysMLv2 model.
+Apply the user's edit to the current model and change nothing else.
+
+Respond with EXACTLY this structure:
+
+---SYSML---
+<the complete, updated SysMLv2 model source code — the FULL model>
+---ANALYSIS---
+{"summary": "...", "completeness": 0-100, "questions": [], "suggestions": [],
+ "conflicts": [{"description": "...", "resolution": "..."}],
+ "missing_definitions": [], "model_health": {"parts_defined": 0,
+ "requirements_defined": 0, "interfaces_defined": 0, "constraints_defined": 0}}
+---END---
+""")
+
+
+# Fast mode: SysML only. The analysis is requested separately afterwards.
+SYSTEM_PROMPT_SYSML_ONLY = textwrap.dedent("""\
+You are EngineeringOS, an expert systems engineer AI that helps hardware
+engineers build formal SysMLv2 models incrementally from natural language.
+
+Translate the user's input into valid SysMLv2 textual notation and merge it
+into the current model. Use part def / port def / requirement def, attributes
+with ISQ or primitive types, multiplicities like [4] or [1..*], :> for
+specialization, one top-level package, and // comments tracing back to the
+NL input.
+
+Respond with EXACTLY this structure and nothing else:
+
+---SYSML---
+<the complete, updated SysMLv2 model source code — NOT a delta, the FULL model>
+---END---
+""")
+
+# Analysis of an already-updated model, used after fast-mode turns
+ANALYSIS_PROMPT = textwrap.dedent("""\
+You are EngineeringOS, an expert systems engineer reviewing a SysMLv2 model
+that was just updated from the user's input. Identify gaps, missing
+definitions and conflicts, ask at most 3 targeted questions, and suggest
+what the user should define next.
 
+Respond with ONLY a JSON object with these fields:
+{
+  "summary": "What changed in this update (1 sentence)",
+  "completeness": 0-100,
+  "questions": [
+    {"priority": "high|medium|low", "question": "...", "context": "why this matters"}
+  ],
+  "suggestions": ["What to define next..."],
+  "conflicts": [
+    {"description": "...", "resolution": "..."}
+  ],
+  "missing_definitions": ["ObjectName1", ...],
+  "model_health": {
+    "parts_defined": 0,
+    "requirements_defined": 0,
+    "interfaces_defined": 0,
+    "constraints_defined": 0
+  }
+}
+""")
+
+
+# ---------------------------------------------------------------------------
+# Model tiering
+# ---------------------------------------------------------------------------
+
+MODEL_FULL = "claude-sonnet-4-5-20250929"
+MODEL_FAST = "claude-haiku-4-5"
+
+SIMPLE_EDIT_PATTERN = re.compile(r"^(rename|delete|remove|add attribute|set) ", re.IGNORECASE)
+COMPLEX_TERMS_PATTERN = re.compile(r"requirement|constraint|conflict", re.IGNORECASE)
+
+
+def classify_complexity(nl_input: str, current_model: str) -> str:
+    """Classify an input as "simple" (a mechanical edit) or "complex"."""
+    if not current_model:
+        return "complex"
+    if len(nl_input) >= 80 or COMPLEX_TERMS_PATTERN.search(nl_input):
+        return "complex"
+    if SIMPLE_EDIT_PATTERN.match(nl_input):
+        return "simple"
+    return "complex"
+
+
+SYSML_MARKER = "---SYSML---"
+ANALYSIS_MARKER = "---ANALYSIS---"
+END_MARKER = "---END---"
+
+ENVELOPE_PATTERN = re.compile(r"---SYSML---(.*?)(?:---ANALYSIS---(.*?))?(?:---END---|\Z)", re.S)
+FENCE_PATTERN = re.compile(r"```(?:sysml|json)?\n?")
+
+
+class EnvelopeParser:
+    """Incrementally split a streamed response into SysML and analysis text.
+
+    ``feed()`` takes each text delta as it arrives and returns the
+    ``(sysml_delta, analysis_delta)`` it completes. A marker-sized tail is
+    held back so markers split across deltas are still recognized.
+    """
+
+    PRE, IN_SYSML, IN_ANALYSIS, DONE = range(4)
+
+    # Markers that end each state, and the state each one leads to. A
+    # SysML-only response goes straight from the SysML to ---END---.
+    TRANSITIONS = {
+        PRE: ((SYSML_MARKER, IN_SYSML),),
+        IN_SYSML: ((ANALYSIS_MARKER, IN_ANALYSIS), (END_MARKER, DONE)),
+        IN_ANALYSIS: ((END_MARKER, DONE),),
+    }
+
+    def __init__(self):
+        self.state = self.PRE
+        self.pending = ""
+
+    def feed(self, delta: str) -> tuple[str, str]:
+        out = {self.IN_SYSML: [], self.IN_ANALYSIS: []}
+        self.pending += delta
+
+        while self.state != self.DONE:
+            transitions = self.TRANSITIONS[self.state]
+            found = [
+                (idx, marker, next_state)
+                for marker, next_state in transitions
+                if (idx := self.pending.find(marker)) >= 0
+            ]
+            if found:
+                idx, marker, next_state = min(found)
+                if self.state in out:
+                    out[self.state].append(self.pending[:idx])
+                self.pending = self.pending[idx + len(marker):]
+                self.state = next_state
+                continue
+
+            keep = max(len(marker) for marker, _ in transitions) - 1
+            if len(self.pending) > keep:
+                if self.state in out:
+                    out[self.state].append(self.pending[:-keep])
+                self.pending = self.pending[-keep:]
+            break
+
+        if self.state == self.DONE:
+            self.pending = ""
+        return "".join(out[self.IN_SYSML]), "".join(out[self.IN_ANALYSIS])
+
+    def close(self) -> tuple[str, str]:
+        """Flush any held-back text once the stream has ended."""
+        rest, self.pending = self.pending, ""
+        if self.state == self.IN_SYSML:
+            return rest, ""
+        if self.state == self.IN_ANALYSIS:
+            return "", rest
+        return "", ""
+
+
+class StreamingValidator:
+    """Validate SysML in the background while it streams in.
+
+    Each time a line completes that closes a definition at package level,
+    the source so far (with the package block closed) is validated on the
+    validation pool, at most once per ``DIAGNOSTIC_INTERVAL``. When the
+    whole model closes it is always validated, so the final result is
+    usually ready by the time the stream ends. Braces are counted with
+    comments and strings blanked out, so only real blocks move the depth;
+    text before the last open comment or string is blanked only once.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.scanned = 0  # Length of the buffer prefix made of complete lines
+        self.settled = 0  # Length of the prefix no later text can re-blank
+        self.settled_depth = 0  # Brace depth at the end of the settled prefix
+        self.depth = 0
+        self.last_submit = 0.0
+        self.pending = None  # Future for the latest partial validation
+        self.complete = None  # (source, future) for the latest closed model
+        self.last_diagnostics = None
+
+    def feed(self, delta: str):
+        self.buffer += delta
+        if "\n" not in delta:
+            return
+
+        # Re-strip from the settled offset: a block comment or string may
+        # have opened on an earlier line and still be open
+        end = self.buffer.rindex("\n") + 1
+        segment = self.buffer[self.settled:end]
+        clean = _strip_comments_and_strings(segment)
+        self.depth = self.settled_depth + clean.count("{") - clean.count("}")
+        closed = "}" in clean[self.scanned - self.settled:]
+
+        open_at = _open_literal_offset(segment, clean)
+        self.settled_depth += clean.count("{", 0, open_at) - clean.count("}", 0, open_at)
+        self.settled += open_at
+        self.scanned = end
+        if not closed or self.depth > 1:
+            return
+
+        partial = strip_fences(self.buffer[:end])
+        if self.depth <= 0:
+            future = validation_pool.submit(validate_sysmlv2, partial)
+            self.complete = (partial, future)
+        elif time.monotonic() - self.last_submit >= DIAGNOSTIC_INTERVAL:
+            # Partials are single-use; keep them out of the validation cache
+            future = validation_pool.submit(validate_sysmlv2, partial + "\n}", cache=False)
+        else:
+            return
+        self.last_submit = time.monotonic()
+        self.pending = future
+
+    def poll(self):
+        """Return the latest partial validation if it finished and changed."""
+        if self.pending is None or not self.pending.done():
+            return None
+        validation = self.pending.result()
+        self.pending = None
+        if validation["diagnostics"] == self.last_diagnostics:
+            return None
+        self.last_diagnostics = validation["diagnostics"]
+        return validation
+
+    def validate(self, source: str) -> dict:
+        """Validate the final source, reusing the background result if it matches."""
+        if self.complete and self.complete[0] == source:
+            return self.complete[1].result()
+        return validate_sysmlv2(source)
+
+
+def build_request(
+    nl_input: str, current_model: str, conversation_history: list, fast: bool = False
+) -> tuple[dict, str]:
+    """Build the Messages API parameters for one agent turn.
+
+    With ``fast`` the model is asked for SysML only. Returns
+    ``(params, input_block)``; the input block is what gets stored in the
+    conversation history once the turn completes.
+    """
     # Build messages with conversation history for context
     messages = []
 
-    # Include last few conversation turns for context (keep it bounded)
-    recent_history = conversation_history[-6:]
-    for turn in recent_history:
-        messages.append(turn)
-
-    # Current request
-    user_msg = f"""CURRENT MODEL STATE:
+    # Include recent conversation turns for context (bounded on append).
+    # System prompt + history is the only prefix that stays identical from
+    # one turn to the next, so the cache breakpoint goes on its last block;
+    # the next turn appends after it and reads the cached prefix back. (A
+    # deferred fast-mode analysis landing costs one miss when it fills in
+    # its turn's placeholder.)
+    messages.extend(conversation_history)
+    if messages:
+        last = messages[-1]
+        messages[-1] = {
+            "role": last["role"],
+            "content": [{"type": "text", "text": last["content"], "cache_control": {"type": "ephemeral"}}],
+        }
+
+    # Current request: the model state changes every turn, so it is sent
+    # uncached after the history.
+    model_block = f"""CURRENT MODEL STATE:
 ```sysml
 {current_model if current_model else '(empty — no model yet)'}
 ```
 
-USER INPUT:
+"""
+    if fast:
+        instruction = "Merge this input into the model."
+    else:
+        instruction = "Analyze this input, update the model, identify gaps, and guide the user."
+    input_block = f"""USER INPUT:
 {nl_input}
 
-Analyze this input, update the model, identify gaps, and guide the user.
+{instruction}
 Remember: output the COMPLETE updated model, not just changes."""
 
-    messages.append({"role": "user", "content": user_msg})
-
-    response = client.messages.create(
-        model="claude-sonnet-4-5-20250929",
-        max_tokens=8192,
-        system=SYSTEM_PROMPT,
-        messages=messages,
-    )
-
-    raw = response.content[0].text
+    messages.append({
+        "role": "user",
+        "content": [
+            {"type": "text", "text": model_block},
+            {"type": "text", "text": input_block},
+        ],
+    })
 
+    # Route mechanical edits to the faster model with the trimmed prompt
+    if classify_complexity(nl_input, current_model) == "simple":
+        model, system_prompt = MODEL_FAST, SYSTEM_PROMPT_LITE
+    else:
+        model, system_prompt = MODEL_FULL, SYSTEM_PROMPT
+    if fast:
+        system_prompt = SYSTEM_PROMPT_SYSML_ONLY
+
+    params = {
+        "model": model,
+        "max_tokens": 8192,
+        "system": system_prompt,
+        "messages": messages,
+    }
+    return params, input_block
+
+
+def parse_analysis(text: str) -> dict:
+    """Parse the analysis JSON, tolerating markdown fences."""
+    # Remove markdown fences if present
+    analysis_str = FENCE_PATTERN.sub("", text).strip()
+    try:
+        return json.loads(analysis_str)
+    except json.JSONDecodeError:
+        return {
+            "summary": "Model updated",
+            "completeness": 0,
+            "questions": [],
+            "suggestions": [],
+            "conflicts": [],
+            "missing_definitions": [],
+            "model_health": {}
+        }
+
+
+def parse_response(raw: str) -> dict:
+    """Split a complete agent response into SysML source and analysis."""
     # Parse the three sections
     sysml_code = ""
     analysis = {}
 
-    if "---SYSML---" in raw and "---ANALYSIS---" in raw:
-        parts = raw.split("---SYSML---", 1)
-        rest = parts[1] if len(parts) > 1 else ""
-
-        if "---ANALYSIS---" in rest:
-            sysml_part, analysis_part = rest.split("---ANALYSIS---", 1)
-            sysml_code = sysml_part.strip()
-
-            # Clean up analysis part
-            analysis_str = analysis_part.replace("---END---", "").strip()
-            # Remove markdown fences if present
-            analysis_str = analysis_str.replace("```json", "").replace("```", "").strip()
-            try:
-                analysis = json.loads(analysis_str)
-            except json.JSONDecodeError:
-                analysis = {
-                    "summary": "Model updated",
-                    "completeness": 0,
-                    "questions": [],
-                    "suggestions": [],
-                    "conflicts": [],
-                    "missing_definitions": [],
-                    "model_health": {}
-                }
+    envelope = ENVELOPE_PATTERN.search(raw)
+    if envelope:
+        sysml_part, analysis_part = envelope.groups()
+        sysml_code = sysml_part
+        # SysML-only (fast mode) responses carry no analysis section
+        if analysis_part is not None:
+            analysis = parse_analysis(analysis_part)
     else:
         # Fallback
-        sysml_code = raw.strip()
+        sysml_code = raw
 
     # Clean markdown fences from SysMLv2
-    sysml_code = sysml_code.replace("```sysml", "").replace("```", "").strip()
-
-    # Store conversation turn for context
-    conversation_history.append({"role": "user", "content": user_msg})
-    conversation_history.append({"role": "assistant", "content": raw})
+    sysml_code = strip_fences(sysml_code)
 
     return {"sysml": sysml_code, "analysis": analysis}
 
 
+def record_turn(conversation_history: list, input_block: str, analysis: dict):
+    """Store a completed turn for context.
+
+    The model source is re-sent with every request, so stored turns keep
+    only the input and the analysis. Stored turns are otherwise only
+    summarized away, so replayed history is a stable cache prefix; the
+    one rewrite is a fast-mode turn's placeholder being replaced by its
+    deferred analysis (see ``apply_deferred_analyses``).
+    """
+    conversation_history.append({"role": "user", "content": input_block})
+    conversation_history.append({
+        "role": "assistant",
+        "content": json.dumps(analysis) if analysis else "Model updated.",
+    })
+
+
+def call_agent(nl_input: str, current_model: str, conversation_history: list, fast: bool = False):
+    """Call Claude as an agentic systems engineer, streaming the response.
+
+    Yields ``("sysml", delta)`` and ``("analysis", delta)`` tuples as each
+    section of the response streams in, then a single
+    ``("result", {"sysml": ..., "analysis": ...})`` once the full response
+    has been received and parsed. In ``fast`` mode the analysis is empty.
+    """
+    params, input_block = build_request(nl_input, current_model, conversation_history, fast)
+    parser = EnvelopeParser()
+
+    with anthropic_client.messages.stream(**params) as stream:
+        for text in stream.text_stream:
+            sysml_delta, analysis_delta = parser.feed(text)
+            if sysml_delta:
+                yield "sysml", sysml_delta
+            if analysis_delta:
+                yield "analysis", analysis_delta
+
+        sysml_delta, analysis_delta = parser.close()
+        if sysml_delta:
+            yield "sysml", sysml_delta
+        if analysis_delta:
+            yield "analysis", analysis_delta
+
+        raw = stream.get_final_message().content[0].text
+
+    result = parse_response(raw)
+    record_turn(conversation_history, input_block, result["analysis"])
+
+    yield "result", result
+
+
+def analyze_model(nl_input: str, sysml: str) -> dict:
+    """Ask the fast model for the agentic analysis of an updated model."""
+    try:
+        response = anthropic_client.messages.create(
+            model=MODEL_FAST,
+            max_tokens=2048,
+            system=ANALYSIS_PROMPT,
+            messages=[{
+                "role": "user",
+                "content": f"USER INPUT:\n{nl_input}\n\nUPDATED MODEL:\n```sysml\n{sysml}\n```",
+            }],
+        )
+    except anthropic.APIError:
+        return parse_analysis("")
+    if not response.content:
+        return parse_analysis("")
+    return parse_analysis(response.content[0].text)
+
+
+def apply_deferred_analyses(session: dict):
+    """Write finished fast-mode analyses back into the session.
+
+    Must be called with the session lock held, before the conversation or
+    history is read. Each finished analysis replaces its turn's placeholder
+    assistant message and history summary; entries dropped meanwhile by a
+    compaction are no longer referenced, so writing to them is harmless.
+    """
+    pending = []
+    for future, assistant_message, history_entry in session["deferred"]:
+        if not future.done():
+            pending.append((future, assistant_message, history_entry))
+            continue
+        if future.exception() is not None:
+            continue  # Keep the placeholder rather than fail the caller
+        analysis = future.result()
+        assistant_message["content"] = json.dumps(analysis)
+        history_entry["summary"] = analysis.get("summary", "")
+    session["deferred"] = pending
+
+
+def strip_fences(sysml: str) -> str:
+    """Remove markdown code fences around SysMLv2 source."""
+    return FENCE_PATTERN.sub("", sysml).strip()
+
+
+SUMMARY_PROMPT = textwrap.dedent("""\
+Summarize this SysMLv2 modeling conversation for the systems engineer AI
+that will continue it. In at most 150 words, keep the user's decisions,
+stated preferences and still-open questions. Do not include SysML source.
+""")
+
+
+def compact_conversation(session: dict):
+    """Fold older turns into one summary message once the history is long.
+
+    Meant to run on ``compaction_pool``: the session lock is held only to
+    snapshot the older turns and to swap in the summary, never across the
+    summarization call itself.
+    """
+    with session["lock"]:
+        apply_deferred_analyses(session)
+        conversation_history = session["conversation"]
+        if session["compacting"] or len(conversation_history) <= MAX_CONVERSATION_MESSAGES:
+            return
+        session["compacting"] = True
+        older = conversation_history[:-KEEP_RECENT_MESSAGES]
+
+    # Dropping the oldest turns is an acceptable fallback, so the swap runs
+    # (and the flag is cleared) however the summarization call ends
+    summary = ""
+    try:
+        transcript = "\n\n".join(f"{turn['role'].upper()}: {turn['content']}" for turn in older)
+        response = anthropic_client.messages.create(
+            model=MODEL_FAST,
+            max_tokens=512,
+            system=SUMMARY_PROMPT,
+            messages=[{"role": "user", "content": transcript}],
+        )
+        if response.content:
+            summary = response.content[0].text.strip()
+    except anthropic.APIError:
+        pass
+    finally:
+        with session["lock"]:
+            session["compacting"] = False
+            # A reset while summarizing leaves nothing to replace
+            if session["conversation"] is conversation_history:
+                del conversation_history[:len(older)]
+                if summary:
+                    conversation_history.insert(0, {"role": "user", "content": f"Prior context summary: {summary}"})
+
+
+def sse_event(event: str, data) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 # ---------------------------------------------------------------------------
 # Routes
 # ---------------------------------------------------------------------------
 
 @app.route("/")
 def index():
+    current_session()
     return render_template("index.html")
 
 
-@app.route("/api/add", methods=["POST"])
-def add_requirement():
-    data = request.json
-    nl_input = data.get("input", "").strip()
-    if not nl_input:
-        return jsonify({"error": "Empty input"}), 400
-
-    try:
-        result = call_agent(
-            nl_input,
-            model_state["sysml_source"],
-            model_state["conversation"],
-        )
-    except anthropic.APIError as e:
-        return jsonify({"error": f"API error: {str(e)}"}), 500
-
+def apply_turn(session: dict, nl_input: str, result: dict, validation: dict) -> dict:
+    """Commit an agent result to the session and build the response payload."""
     new_source = result["sysml"]
     analysis = result["analysis"]
 
-    # Validate
-    validation = validate_sysmlv2(new_source)
-
     # Merge validation errors into analysis conflicts
     if validation["error_count"] > 0:
         for diag in validation["diagnostics"]:
@@ -233,32 +761,209 @@ def add_requirement():
                 })
 
     # Update state
-    model_state["sysml_source"] = new_source
-    model_state["history"].append({
+    session["sysml_source"] = new_source
+    session["generation"] += 1
+    session["history"].append({
         "nl": nl_input,
         "timestamp": datetime.now().isoformat(),
         "summary": analysis.get("summary", ""),
     })
 
-    return jsonify({
+    return {
         "sysml": new_source,
         "validation": validation,
         "analysis": analysis,
-        "history_length": len(model_state["history"]),
-    })
+        "history_length": len(session["history"]),
+    }
+
+
+@app.route("/api/add", methods=["POST"])
+def add_requirement():
+    data = request.json
+    nl_input = data.get("input", "").strip()
+    if not nl_input:
+        return jsonify({"error": "Empty input"}), 400
+    fast = request.args.get("fast") == "1" or bool(data.get("fast"))
+
+    session = current_session()
+
+    def generate():
+        with session["lock"]:
+            session["turn_active"] = True
+            try:
+                yield from run_turn()
+            finally:
+                session["turn_active"] = False
+
+    def run_turn():
+        result = None
+        validator = StreamingValidator()
+        apply_deferred_analyses(session)
+        try:
+            for event, payload in call_agent(
+                nl_input,
+                session["sysml_source"],
+                session["conversation"],
+                fast,
+            ):
+                if event == "sysml":
+                    yield sse_event("sysml", {"delta": payload})
+                    validator.feed(payload)
+                elif event == "analysis":
+                    yield sse_event("analysis_delta", {"delta": payload})
+                else:
+                    result = payload
+
+                partial = validator.poll()
+                if partial:
+                    yield sse_event("diagnostic", {"validation": partial})
+        except anthropic.APIError as e:
+            yield sse_event("error", {"error": f"API error: {str(e)}"})
+            return
+
+        validation = validator.validate(result["sysml"])
+        payload = apply_turn(session, nl_input, result, validation)
+        if fast:
+            # Analysis runs in the background; the UI long-polls for it, and
+            # the next turn writes it back into the conversation
+            turn = payload["history_length"]
+            analyses = session["analyses"]
+            future = analyses[turn] = analysis_pool.submit(analyze_model, nl_input, result["sysml"])
+            session["deferred"].append((future, session["conversation"][-1], session["history"][-1]))
+            for old_turn in sorted(analyses)[:-MAX_PENDING_ANALYSES]:
+                analyses.pop(old_turn, None)
+            payload["analysis_pending"] = True
+
+        yield sse_event("analysis", payload)
+
+        # Summarize in the background so it never delays the user
+        compaction_pool.submit(compact_conversation, session)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/analysis", methods=["GET"])
+def get_analysis():
+    """Long-poll for the deferred analysis of a fast-mode turn."""
+    turn = request.args.get("turn", type=int)
+    session = current_session(create=False)
+    if session is None:
+        return jsonify({"error": "No pending analysis for this turn"}), 404
+    # A turn may be streaming with the session lock held; single get/pop
+    # calls on the analyses dict are atomic, so the lock is not needed
+    future = session["analyses"].get(turn)
+    if future is None:
+        return jsonify({"error": "No pending analysis for this turn"}), 404
+
+    try:
+        analysis = future.result(timeout=ANALYSIS_POLL_TIMEOUT)
+    except FutureTimeoutError:
+        return jsonify({"turn": turn, "status": "pending"}), 202
+
+    session["analyses"].pop(turn, None)
+    return jsonify({"turn": turn, "analysis": analysis})
+
+
+@app.route("/api/add_batch", methods=["POST"])
+def add_batch():
+    """Submit a multi-step NL script through the Message Batches API.
+
+    Each step builds on the model produced by the previous one, so the
+    script is sent as a single batched turn rather than one request per
+    step. Poll ``GET /api/add_batch/<batch_id>`` for the result.
+    """
+    data = request.json
+    inputs = data.get("inputs")
+    if isinstance(inputs, list):
+        inputs = [text.strip() for text in inputs if isinstance(text, str) and text.strip()]
+    if not inputs or not isinstance(inputs, list):
+        return jsonify({"error": "Empty input"}), 400
+
+    steps = "\n".join(f"{n}. {text}" for n, text in enumerate(inputs, 1))
+    nl_input = f"Apply these steps in order:\n{steps}"
+
+    session = current_session()
+    with session["lock"]:
+        apply_deferred_analyses(session)
+        params, input_block = build_request(nl_input, session["sysml_source"], session["conversation"])
+        try:
+            batch = anthropic_client.messages.batches.create(
+                requests=[{"custom_id": "script", "params": params}],
+            )
+        except anthropic.APIError as e:
+            return jsonify({"error": f"API error: {str(e)}"}), 500
+
+        session["batches"][batch.id] = {
+            "nl": nl_input,
+            "input_block": input_block,
+            "base_source": session["sysml_source"],
+        }
+
+    return jsonify({"batch_id": batch.id, "status": batch.processing_status}), 202
+
+
+@app.route("/api/add_batch/<batch_id>", methods=["GET"])
+def get_batch(batch_id):
+    session = current_session(create=False)
+    if session is None or batch_id not in session["batches"]:
+        return jsonify({"error": "Unknown batch"}), 404
+
+    try:
+        batch = anthropic_client.messages.batches.retrieve(batch_id)
+        if batch.processing_status != "ended":
+            return jsonify({"batch_id": batch_id, "status": batch.processing_status}), 202
+
+        raw = None
+        for entry in anthropic_client.messages.batches.results(batch_id):
+            if entry.custom_id == "script" and entry.result.type == "succeeded":
+                raw = entry.result.message.content[0].text
+    except anthropic.APIError as e:
+        return jsonify({"error": f"API error: {str(e)}"}), 500
+
+    with session["lock"]:
+        pending = session["batches"].pop(batch_id, None)
+        if pending is None:
+            return jsonify({"error": "Unknown batch"}), 404
+        if raw is None:
+            return jsonify({"error": "Batch request did not succeed"}), 500
+
+        result = parse_response(raw)
+        if session["sysml_source"] != pending["base_source"]:
+            return jsonify({
+                "error": "The model changed while the batch was running; result not applied",
+                "sysml": result["sysml"],
+            }), 409
+
+        record_turn(session["conversation"], pending["input_block"], result["analysis"])
+        payload = apply_turn(session, pending["nl"], result, validate_sysmlv2(result["sysml"]))
+
+    compaction_pool.submit(compact_conversation, session)
+    return jsonify(payload)
 
 
 @app.route("/api/model", methods=["GET"])
 def get_model():
-    return jsonify({
-        "sysml": model_state["sysml_source"],
-        "history": model_state["history"],
-    })
+    session = current_session(create=False)
+    if session is None:
+        return jsonify({"sysml": "", "history": []})
+    with session["lock"]:
+        apply_deferred_analyses(session)
+        return jsonify({
+            "sysml": session["sysml_source"],
+            "history": list(session["history"]),
+        })
 
 
 @app.route("/api/reset", methods=["POST"])
 def reset():
-    reset_model()
+    session = current_session(create=False)
+    if session is not None:
+        with session["lock"]:
+            reset_model(session)
     return jsonify({"status": "ok"})
 
 
@@ -267,7 +972,17 @@ def validate_endpoint():
     data = request.json
     source = data.get("source", "")
     validation = validate_sysmlv2(source)
-    model_state["sysml_source"] = source
+    session = current_session(create=False)
+    if session is None:
+        return jsonify({"validation": validation})
+    # Editor text sent while a turn streams is a half-written model, and a
+    # turn that commits while we wait for the lock supersedes it: validate
+    # it, but only persist it if the model is still the one it was based on.
+    generation = session["generation"]
+    if not session["turn_active"]:
+        with session["lock"]:
+            if session["generation"] == generation and not session["turn_active"]:
+                session["sysml_source"] = source
     return jsonify({"validation": validation})
 
 
@@ -276,4 +991,10 @@ if __name__ == "__main__":
         print("\n⚠️  Set ANTHROPIC_API_KEY environment variable first:")
         print("   export ANTHROPIC_API_KEY='sk-ant-...'")
         print()
-    app.run(debug=True, port=8080)
+    print("Development server. For concurrent users run:")
+    print("   hypercorn asgi:app --worker-class asyncio --bind 0.0.0.0:8080")
+    print()
+    # Only the reloader's child process serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warm_up()
+    app.run(debug=True, port=8080, threaded=True)
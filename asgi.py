@@ -0,0 +1,58 @@
+"""
+ASGI entry point
+================
+Serves the Flask app under Hypercorn for anything beyond local development:
+
+    hypercorn asgi:app --worker-class asyncio --bind 0.0.0.0:8080
+
+Each request runs on a thread from a dedicated pool and holds it until the
+response finishes: a streaming agent turn for the length of the stream, an
+``/api/analysis`` long-poll for up to its timeout. At most REQUEST_THREADS
+requests (``EOS_REQUEST_THREADS``, default 64) are served at once; further
+requests queue until a thread frees up. Request bodies are limited to
+MAX_BODY_SIZE; larger ones get a 400.
+
+Sessions live in process memory, so run a single worker process; add
+workers only once session state moves to a shared store.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from hypercorn.middleware import AsyncioWSGIMiddleware
+
+from app import app as flask_app, start_warm_up
+
+# Requests served concurrently. Hypercorn would otherwise use the event
+# loop's default executor, sized min(32, CPUs + 4).
+REQUEST_THREADS = int(os.environ.get("EOS_REQUEST_THREADS", "64"))
+# Largest request body accepted. Hypercorn's 64 KiB default is smaller than
+# a large model sent to /api/validate.
+MAX_BODY_SIZE = 8 * 1024 * 1024
+
+
+class PooledWSGIMiddleware(AsyncioWSGIMiddleware):
+    """Runs requests on a thread pool sized for long-lived streams.
+
+    The pool is the middleware's own, so the event loop's default executor
+    is left to its other users (DNS lookups and the like).
+    """
+
+    def __init__(self, wsgi_app, max_body_size: int, max_workers: int):
+        super().__init__(wsgi_app, max_body_size)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="request")
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+
+        def _call_soon(func, *args):
+            return asyncio.run_coroutine_threadsafe(func(*args), loop).result()
+
+        await self.wsgi_app(scope, receive, send, partial(loop.run_in_executor, self.executor), _call_soon)
+
+
+app = PooledWSGIMiddleware(flask_app, max_body_size=MAX_BODY_SIZE, max_workers=REQUEST_THREADS)
+
+start_warm_up()
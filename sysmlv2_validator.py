@@ -6,7 +6,12 @@ Checks syntax, balanced braces/brackets, keyword usage,
 reference resolution, and constraint consistency.
 """
 
+import copy
+import hashlib
 import re
+import sys
+from bisect import bisect_right
+from functools import lru_cache
 from dataclasses import dataclass, field
 from typing import Optional
 
@@ -73,6 +78,81 @@ IMPORT_KEYWORDS = {"import", "alias"}
 
 OPERATORS = {":>", ":>>", "=", "==", "!=", "<=", ">=", "<", ">", "&&", "||"}
 
+# Built-in / primitive types that don't need to be defined
+_BUILTINS = frozenset({
+    "Real", "Integer", "Boolean", "String", "Natural",
+    "Positive", "ScalarValues", "NumericalValue",
+    "MassValue", "LengthValue", "TimeValue", "ForceValue",
+    "VoltageValue", "CurrentValue", "PowerValue", "TemperatureValue",
+    "PressureValue", "FrequencyValue", "SpeedValue", "AccelerationValue",
+    "AngularVelocityValue", "TorqueValue", "EnergyValue",
+})
+
+# Common misspellings / SysMLv1 holdovers and their v2 replacements
+_V1_TO_V2 = {
+    "block": "part def",
+    "value type": "attribute def",
+    "flowPort": "port",
+    "SysML::": "SysML v2 uses package imports, not SysML:: prefix",
+}
+
+
+# ---------------------------------------------------------------------------
+# Patterns
+# ---------------------------------------------------------------------------
+
+# Definitions: <keyword> def <Name> { ... }
+_DEF_RE = re.compile(
+    r"(part|port|requirement|constraint|action|state|enum|item|interface|connection|attribute)\s+def\s+(\w[\w']*)"
+)
+# Package declarations
+_PKG_RE = re.compile(r"package\s+(\w[\w':]*)")
+# Usages: <keyword> <name> : <TypeRef>
+_USAGE_RE = re.compile(
+    r"(part|port|attribute|requirement|constraint|action|state|item)\s+(\w[\w']*)\s*:\s*(\w[\w':]*)"
+)
+# Type references from usages
+_TYPE_REF_RE = re.compile(r"(?:part|port|attribute|item)\s+\w[\w']*\s*:\s*(\w[\w']*)")
+_SPECIALIZATION_RE = re.compile(r":>\s*(\w[\w']*)")
+_MULT_RE = re.compile(r"\[([^\]]*)\]")
+_VALID_MULT_RE = re.compile(r"^(\d+|\*)(\.\.(\d+|\*))?$")
+_CONSTRAINT_RE = re.compile(r"(require|assume|assert)\s+constraint\b")
+_V1_RE = re.compile("|".join(map(re.escape, _V1_TO_V2)))
+_NEEDS_SEMI_RE = re.compile(r"^\s*(import|alias)\s+.*[^;{}\s]\s*$")
+# Comments and string literals (an unterminated block comment runs to EOF)
+_COMMENT_STRING_RE = re.compile(r'//[^\n]*|/\*.*?(?:\*/|\Z)|"(?:\\.|[^"\\])*"', re.S)
+# Everything except line boundaries, so blanking keeps line/col positions
+_NON_NEWLINE_RE = re.compile(r"[^\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+_DELIM_RE = re.compile(r"[{}()\[\]]")
+_LINE_BREAK_RE = re.compile(r"\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+def _strip_comments_and_strings(source: str) -> str:
+    """Blank out comments and string literals, preserving line/col positions."""
+    return _COMMENT_STRING_RE.sub(lambda m: _NON_NEWLINE_RE.sub(" ", m.group()), source)
+
+
+def _open_literal_offset(source: str, clean: str) -> int:
+    """Offset of a block comment or string literal still open at the end of ``source``.
+
+    ``clean`` is ``source`` after ``_strip_comments_and_strings``. Text from
+    the returned offset on may be blanked differently once more source is
+    appended; text before it never is. Returns ``len(source)`` if nothing
+    is open.
+    """
+    offset = len(source)
+    # An unterminated string never matches, so its opening quote survives
+    quote = clean.find('"')
+    if quote != -1:
+        offset = quote
+    last = None
+    for last in _COMMENT_STRING_RE.finditer(source):
+        pass
+    if last and last.group().startswith("/*") and (len(last.group()) < 4 or not last.group().endswith("*/")):
+        offset = min(offset, last.start())
+    return offset
+
 
 class SysMLv2Validator:
     """Validate SysMLv2 textual notation source code."""
@@ -80,7 +160,6 @@ class SysMLv2Validator:
     def __init__(self):
         self.errors: list[ValidationError] = []
         self.symbols: dict[str, Symbol] = {}
-        self.lines: list[str] = []
 
     # ------------------------------------------------------------------
     # Public API
@@ -88,17 +167,13 @@ class SysMLv2Validator:
 
     def validate(self, source: str) -> list[dict]:
         """Run all validation passes and return error dicts."""
-        self.errors = []
         self.symbols = {}
-        self.lines = source.splitlines()
 
-        self._check_balanced(source)
-        self._check_keywords(source)
-        self._collect_symbols(source)
-        self._check_type_references(source)
-        self._check_multiplicity(source)
-        self._check_constraint_blocks(source)
-        self._check_semicolons(source)
+        source_clean = _strip_comments_and_strings(source)
+        # Passes return their own diagnostics rather than sharing self.errors.
+        # They run sequentially: re holds the GIL, so threads would only add
+        # overhead.
+        self.errors = self._check_balanced(source_clean) + self._scan(source_clean)
 
         # Sort by line number
         self.errors.sort(key=lambda e: (e.line, e.col))
@@ -108,218 +183,132 @@ class SysMLv2Validator:
     # Pass 1: Balanced delimiters
     # ------------------------------------------------------------------
 
-    def _check_balanced(self, source: str):
+    def _check_balanced(self, source_clean: str) -> list[ValidationError]:
+        """Match delimiters in comment/string-stripped source."""
+        errors = []
         stack = []
         pairs = {"{": "}", "(": ")", "[": "]"}
-        closing = set(pairs.values())
-        in_string = False
-        in_line_comment = False
-        in_block_comment = False
-        prev_char = ""
-
-        for lineno, line in enumerate(self.lines, 1):
-            in_line_comment = False
-            for col, ch in enumerate(line, 1):
-                # Track comments
-                if not in_string and not in_block_comment and prev_char == "/" and ch == "/":
-                    in_line_comment = True
-                if not in_string and not in_line_comment and prev_char == "/" and ch == "*":
-                    in_block_comment = True
-                if in_block_comment and prev_char == "*" and ch == "/":
-                    in_block_comment = False
-                    prev_char = ch
-                    continue
-                if in_line_comment or in_block_comment:
-                    prev_char = ch
-                    continue
-
-                # Track strings
-                if ch == '"' and prev_char != "\\":
-                    in_string = not in_string
-                if in_string:
-                    prev_char = ch
-                    continue
-
-                if ch in pairs:
-                    stack.append((ch, lineno, col))
-                elif ch in closing:
-                    if not stack:
-                        self.errors.append(ValidationError(lineno, col, f"Unmatched closing '{ch}'"))
-                    else:
-                        open_ch, open_line, open_col = stack.pop()
-                        expected = pairs[open_ch]
-                        if ch != expected:
-                            self.errors.append(
-                                ValidationError(
-                                    lineno, col,
-                                    f"Mismatched delimiter: expected '{expected}' (opened at line {open_line}:{open_col}) but found '{ch}'"
-                                )
-                            )
-                prev_char = ch
+        line_starts = [0] + [m.end() for m in _LINE_BREAK_RE.finditer(source_clean)]
+
+        for m in _DELIM_RE.finditer(source_clean):
+            ch = m.group()
+            pos = m.start()
+            lineno = bisect_right(line_starts, pos)
+            col = pos - line_starts[lineno - 1] + 1
+
+            if ch in pairs:
+                stack.append((ch, lineno, col))
+            elif not stack:
+                errors.append(ValidationError(lineno, col, f"Unmatched closing '{ch}'"))
+            else:
+                open_ch, open_line, open_col = stack.pop()
+                expected = pairs[open_ch]
+                if ch != expected:
+                    errors.append(
+                        ValidationError(
+                            lineno, col,
+                            f"Mismatched delimiter: expected '{expected}' (opened at line {open_line}:{open_col}) but found '{ch}'"
+                        )
+                    )
 
         for open_ch, open_line, open_col in stack:
             expected = pairs[open_ch]
-            self.errors.append(
+            errors.append(
                 ValidationError(open_line, open_col, f"Unclosed '{open_ch}' — expected '{expected}'")
             )
+        return errors
 
     # ------------------------------------------------------------------
-    # Pass 2: Keyword validation
+    # Pass 2: Line checks
     # ------------------------------------------------------------------
 
-    def _check_keywords(self, source: str):
-        # Check for common misspellings / SysMLv1 holdovers
-        v1_to_v2 = {
-            "block": "part def",
-            "value type": "attribute def",
-            "flowPort": "port",
-            "SysML::": "SysML v2 uses package imports, not SysML:: prefix",
-        }
-        for lineno, line in enumerate(self.lines, 1):
-            stripped = line.strip()
-            if stripped.startswith("//") or stripped.startswith("/*"):
-                continue
-            for v1_kw, suggestion in v1_to_v2.items():
-                if v1_kw in line:
-                    col = line.index(v1_kw) + 1
-                    self.errors.append(
-                        ValidationError(
-                            lineno, col,
-                            f"'{v1_kw}' is SysML v1 syntax. In SysML v2, use '{suggestion}' instead.",
-                            severity="warning",
-                        )
-                    )
+    def _scan(self, source_clean: str) -> list[ValidationError]:
+        """Walk the source once, collecting symbols and running line checks.
 
-    # ------------------------------------------------------------------
-    # Pass 3: Symbol collection
-    # ------------------------------------------------------------------
+        Comments and strings are blanked out up front, so every check sees
+        code only. Type references are resolved after the walk, once the
+        full symbol table is known.
+        """
+        errors = []
+        clean_lines = source_clean.splitlines()
+        type_refs = []  # (lineno, col, ref, message)
 
-    def _collect_symbols(self, source: str):
-        # Match definitions: <keyword> def <Name> { ... }
-        def_pattern = re.compile(
-            r"(part|port|requirement|constraint|action|state|enum|item|interface|connection|attribute)\s+def\s+(\w[\w']*)"
-        )
-        # Match package declarations
-        pkg_pattern = re.compile(r"package\s+(\w[\w':]*)")
-        # Match usages: <keyword> <name> : <TypeRef>
-        usage_pattern = re.compile(
-            r"(part|port|attribute|requirement|constraint|action|state|item)\s+(\w[\w']*)\s*:\s*(\w[\w':]*)"
-        )
-
-        for lineno, line in enumerate(self.lines, 1):
-            stripped = line.strip()
-            if stripped.startswith("//") or stripped.startswith("/*"):
+        for lineno, line in enumerate(clean_lines, 1):
+            if not line or line.isspace():
                 continue
 
-            for m in def_pattern.finditer(line):
+            # SysML v1 holdovers
+            for m in _V1_RE.finditer(line):
+                v1_kw = m.group()
+                errors.append(
+                    ValidationError(
+                        lineno, m.start() + 1,
+                        f"'{v1_kw}' is SysML v1 syntax. In SysML v2, use '{_V1_TO_V2[v1_kw]}' instead.",
+                        severity="warning",
+                    )
+                )
+
+            # Symbol collection
+            for m in _DEF_RE.finditer(line):
                 kind = m.group(1) + "_def"
-                name = m.group(2)
+                name = sys.intern(m.group(2))
                 self.symbols[name] = Symbol(name=name, kind=kind, line=lineno)
 
-            for m in pkg_pattern.finditer(line):
-                name = m.group(1)
+            for m in _PKG_RE.finditer(line):
+                name = sys.intern(m.group(1))
                 self.symbols[name] = Symbol(name=name, kind="package", line=lineno)
 
-            for m in usage_pattern.finditer(line):
-                name = m.group(2)
+            for m in _USAGE_RE.finditer(line):
+                name = sys.intern(m.group(2))
                 type_ref = m.group(3)
                 self.symbols[name] = Symbol(
                     name=name, kind=m.group(1), line=lineno, type_ref=type_ref
                 )
 
-    # ------------------------------------------------------------------
-    # Pass 4: Type reference checking
-    # ------------------------------------------------------------------
-
-    def _check_type_references(self, source: str):
-        # Built-in / primitive types that don't need to be defined
-        builtins = {
-            "Real", "Integer", "Boolean", "String", "Natural",
-            "Positive", "ScalarValues", "NumericalValue",
-            "MassValue", "LengthValue", "TimeValue", "ForceValue",
-            "VoltageValue", "CurrentValue", "PowerValue", "TemperatureValue",
-            "PressureValue", "FrequencyValue", "SpeedValue", "AccelerationValue",
-            "AngularVelocityValue", "TorqueValue", "EnergyValue",
-        }
-        # Collect all type references from usages
-        type_ref_pattern = re.compile(
-            r"(?:part|port|attribute|item)\s+\w[\w']*\s*:\s*(\w[\w']*)"
-        )
-        specialization_pattern = re.compile(r":>\s*(\w[\w']*)")
-
-        for lineno, line in enumerate(self.lines, 1):
-            stripped = line.strip()
-            if stripped.startswith("//") or stripped.startswith("/*") or stripped.startswith("import"):
-                continue
-
-            for m in type_ref_pattern.finditer(line):
-                ref = m.group(1)
-                if ref not in self.symbols and ref not in builtins:
-                    self.errors.append(
-                        ValidationError(
-                            lineno, line.index(ref) + 1,
-                            f"Unresolved type reference '{ref}'. Define it with '{ref}' def or add an import.",
-                            severity="warning",
-                        )
-                    )
-
-            for m in specialization_pattern.finditer(line):
-                ref = m.group(1)
-                if ref not in self.symbols and ref not in builtins:
-                    self.errors.append(
-                        ValidationError(
-                            lineno, line.index(ref) + 1,
-                            f"Unresolved specialization target '{ref}'.",
-                            severity="warning",
-                        )
-                    )
-
-    # ------------------------------------------------------------------
-    # Pass 5: Multiplicity syntax
-    # ------------------------------------------------------------------
-
-    def _check_multiplicity(self, source: str):
-        mult_pattern = re.compile(r"\[([^\]]*)\]")
-        valid_mult = re.compile(r"^(\d+|\*)(\.\.(\d+|\*))?$")
-
-        for lineno, line in enumerate(self.lines, 1):
-            stripped = line.strip()
-            if stripped.startswith("//") or stripped.startswith("/*"):
-                continue
-            for m in mult_pattern.finditer(line):
+            # Type references (usage patterns never match import lines)
+            for m in _TYPE_REF_RE.finditer(line):
+                ref = sys.intern(m.group(1))
+                type_refs.append((
+                    lineno, m.start(1) + 1, ref,
+                    f"Unresolved type reference '{ref}'. Define it with '{ref}' def or add an import.",
+                ))
+
+            for m in _SPECIALIZATION_RE.finditer(line):
+                ref = sys.intern(m.group(1))
+                type_refs.append((
+                    lineno, m.start(1) + 1, ref,
+                    f"Unresolved specialization target '{ref}'.",
+                ))
+
+            # Multiplicity syntax
+            for m in _MULT_RE.finditer(line):
                 content = m.group(1).strip()
                 # Skip if it looks like a unit (e.g., [kg])
                 if content.isalpha():
                     continue
-                if content and not valid_mult.match(content):
-                    self.errors.append(
+                if content and not _VALID_MULT_RE.match(content):
+                    errors.append(
                         ValidationError(
                             lineno, m.start() + 1,
                             f"Invalid multiplicity '[{content}]'. Use forms like [1], [*], [0..1], [1..*].",
                         )
                     )
 
-    # ------------------------------------------------------------------
-    # Pass 6: Constraint block validation
-    # ------------------------------------------------------------------
-
-    def _check_constraint_blocks(self, source: str):
-        constraint_pattern = re.compile(r"(require|assume|assert)\s+constraint\b")
-        for lineno, line in enumerate(self.lines, 1):
-            m = constraint_pattern.search(line)
+            # Constraint blocks
+            m = _CONSTRAINT_RE.search(line)
             if m:
                 # Check that there's a { somewhere after
                 rest = line[m.end():]
                 if "{" not in rest:
                     # Look at next non-empty line
                     found_brace = False
-                    for next_line in self.lines[lineno:]:
+                    for next_line in clean_lines[lineno:]:
                         if next_line.strip():
                             if "{" in next_line:
                                 found_brace = True
                             break
                     if not found_brace:
-                        self.errors.append(
+                        errors.append(
                             ValidationError(
                                 lineno, m.start() + 1,
                                 f"'{m.group(1)} constraint' should be followed by a block '{{ expression }}'.",
@@ -327,18 +316,9 @@ class SysMLv2Validator:
                             )
                         )
 
-    # ------------------------------------------------------------------
-    # Pass 7: Statement termination
-    # ------------------------------------------------------------------
-
-    def _check_semicolons(self, source: str):
-        """Check for statements that look like they need semicolons."""
-        needs_semi = re.compile(
-            r"^\s*(import|alias)\s+.*[^;{}\s]\s*$"
-        )
-        for lineno, line in enumerate(self.lines, 1):
-            if needs_semi.match(line):
-                self.errors.append(
+            # Statement termination
+            if _NEEDS_SEMI_RE.match(line):
+                errors.append(
                     ValidationError(
                         lineno, len(line),
                         "Import/alias statements should end with ';'.",
@@ -346,13 +326,39 @@ class SysMLv2Validator:
                     )
                 )
 
+        # One lookup per reference against everything that resolves
+        known = _BUILTINS | self.symbols.keys()
+        for lineno, col, ref, message in type_refs:
+            if ref not in known:
+                errors.append(ValidationError(lineno, col, message, severity="warning"))
+        return errors
+
 
 # ---------------------------------------------------------------------------
 # Convenience function
 # ---------------------------------------------------------------------------
 
-def validate_sysmlv2(source: str) -> dict:
-    """Validate SysMLv2 source and return a result dict."""
+def validate_sysmlv2(source: str, cache: bool = True) -> dict:
+    """Validate SysMLv2 source and return a result dict.
+
+    Validation is pure, so results are memoized by source; resubmitting
+    unchanged source (e.g. revalidating on blur) skips all passes. Pass
+    ``cache=False`` for one-off sources, such as partial models while a
+    response streams, so they don't evict entries worth keeping.
+    """
+    if not cache:
+        return _validate(source)
+    source_hash = hashlib.blake2b(source.encode(), digest_size=16).digest()
+    # Callers may mutate the result, so never hand out the cached dict
+    return copy.deepcopy(_validate_cached(source_hash, source))
+
+
+@lru_cache(maxsize=128)
+def _validate_cached(source_hash: bytes, source: str) -> dict:
+    return _validate(source)
+
+
+def _validate(source: str) -> dict:
     validator = SysMLv2Validator()
     errors = validator.validate(source)
     error_count = sum(1 for e in errors if e["severity"] == "error")
@@ -0,0 +1,23 @@
+"""Tests for the SysMLv2 validator's handling of comments."""
+
+from sysmlv2_validator import validate_sysmlv2
+
+
+def unresolved(source: str) -> list[str]:
+    return [d["message"] for d in validate_sysmlv2(source)["diagnostics"]
+            if d["message"].startswith("Unresolved type reference")]
+
+
+def test_unresolved_type_reference_is_reported():
+    source = "package P {\n    part def A;\n    part a : Missing;\n}"
+    assert len(unresolved(source)) == 1
+
+
+def test_type_reference_in_line_comment_is_ignored():
+    source = "package P {\n    part def A;\n    part a : A; // was: part a : Missing;\n}"
+    assert unresolved(source) == []
+
+
+def test_type_reference_in_block_comment_is_ignored():
+    source = "package P {\n    part def A;\n    /* part b : Missing;\n       part c : Other; */\n    part a : A;\n}"
+    assert unresolved(source) == []